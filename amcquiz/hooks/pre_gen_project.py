@@ -1,4 +1,3 @@
-import re
 import sys
 
 has_versions = {{ cookiecutter['has_versions'] }}
@@ -47,13 +46,13 @@ def is_valid_version(x: str) -> bool:
     >>> is_valid_version('')
     False
     """
-    if not x:
-        return False
-    return bool(re.match(r"^[a-zA-Z0-9]+$", x))
+    return bool(x) and x.isascii() and x.isalnum()
 
 if (__name__ == '__main__'):
     if has_versions:
-        versions = [v.strip() for v in versions_csv.split(",")]
+        # An insertion-ordered dict keeps the codes in the order given for
+        # error messages while giving constant-time membership checks.
+        versions = dict.fromkeys(v.strip() for v in versions_csv.split(","))
         invalid_versions = [v for v in versions if not is_valid_version(v)]
         if invalid_versions:
             print(
@@ -0,0 +1,122 @@
+"""Shared pytest fixtures for the template tests."""
+import hashlib
+import json
+import subprocess
+
+import pytest
+
+from test.test_utils import (
+    REPO_ROOT,
+    compile_template,
+    init_git_repo,
+    prepare_config,
+    run_cookiecutter_cli,
+    run_cookiecutter_with_replay,
+    write_replay,
+)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-slow",
+        action="store_true",
+        default=False,
+        help="run tests marked slow (full l3build/LaTeX builds)",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "slow: long-running test; skipped unless --run-slow is given"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip `slow` tests unless `--run-slow` was given."""
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow test; use --run-slow to run it")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture(scope="session")
+def hook_templates() -> dict:
+    """Map each template hook source file to its compiled Jinja2 template.
+
+    Each hook is read and compiled once per session; tests render the
+    templates with their own cookiecutter context. Cookiecutter only runs
+    hooks from the top level of `hooks/`, so the directory is not recursed.
+    """
+    template_hooks = REPO_ROOT / "hooks"
+    if not template_hooks.exists():
+        return {}
+    return {
+        p: compile_template(p.read_text(encoding="utf8"))
+        for p in sorted(template_hooks.iterdir())
+        if p.suffix == ".py" and not p.name.startswith(".")
+    }
+
+
+# Rendered projects shared across the session, keyed by replay-context hash.
+_RENDERED = {}
+_COMMITTED = {}
+
+
+def _context_key(context: dict) -> str:
+    return hashlib.sha1(json.dumps(context, sort_keys=True).encode()).hexdigest()
+
+
+@pytest.fixture(scope="session")
+def rendered_project(request, tmp_path_factory) -> tuple:
+    """Render the template with cookiecutter once per distinct replay context.
+
+    Use through indirect parametrization, passing the replay context as the
+    parameter. Returns ``(proc, output_dir)`` where `proc` is the
+    CompletedProcess from `run_cookiecutter_with_replay`.
+    """
+    context = request.param
+    key = _context_key(context)
+    if key not in _RENDERED:
+        base = tmp_path_factory.mktemp("cc")
+        replay = write_replay(base, context, name="replay.json")
+        output_dir = base / key
+        output_dir.mkdir()
+        proc = run_cookiecutter_with_replay(
+            replay, output_dir, config_file=prepare_config(base)
+        )
+        _RENDERED[key] = (proc, output_dir)
+    return _RENDERED[key]
+
+
+@pytest.fixture(scope="session")
+def rendered_and_committed(request, tmp_path_factory) -> tuple:
+    """Render the template via the cookiecutter CLI and commit it to git,
+    once per distinct replay context.
+
+    Use through indirect parametrization, passing the replay context as the
+    parameter. Returns ``(proc, gen_dir)`` where `proc` is the
+    CompletedProcess from `run_cookiecutter_cli`; the git commit is only
+    made when rendering succeeded.
+    """
+    context = request.param
+    key = _context_key(context)
+    if key not in _COMMITTED:
+        base = tmp_path_factory.mktemp("l3")
+        replay = write_replay(base, context, name="replay.json")
+        output_dir = base / key
+        output_dir.mkdir()
+        proc = run_cookiecutter_cli(replay, output_dir)
+        gen_dir = output_dir / context["cookiecutter"]["exam_code"]
+        if proc.returncode == 0 and gen_dir.exists():
+            # vc.lua reads the version metadata from git
+            try:
+                init_git_repo(
+                    gen_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+            except subprocess.CalledProcessError:
+                # If git fails, continue — l3build/ vc.lua may still work in some cases
+                pass
+        _COMMITTED[key] = (proc, gen_dir)
+    return _COMMITTED[key]
@@ -1,81 +1,197 @@
 """pytest runner that executes doctests found in all python modules in the repo.
 
 This test will:
- - discover .py files under the repository root (excluding hidden dirs, __pycache__, and test files),
+ - discover .py files under the repository root (excluding hidden dirs, __pycache__, and test files)
+   that contain doctest examples,
  - import each module dynamically, and
  - run doctest.testmod on the imported module.
 
 The test fails if any doctest failure is reported or if a module fails to import.
 """
 from pathlib import Path
-import importlib.util
+import os
+import re
+import types
 import doctest
 import traceback
 import pytest
-import json
-import subprocess
 import sys
-import jinja2
+
+from test.test_utils import default_replay_context
 
 
 ROOT = Path(__file__).resolve().parent.parent
 
 
-def _iter_python_files(root: Path = ROOT):
-    """Yield candidate Python files to check for doctests.
+# Directories that never contain modules we want to doctest.
+_SKIP_DIRS = {"__pycache__", "site-packages", "node_modules", "test"}
+
+# Top-level directories whose Python files are cookiecutter templates.
+_TEMPLATE_DIRS = {"hooks"}
+
+# Jinja statement blocks, or expressions such as `{{ cookiecutter.* }}`.
+_TEMPLATE_RE = re.compile(rb"\{%|\{\{.*?\}\}", re.DOTALL)
+
+
+def _is_template(source: bytes) -> bool:
+    """Return True if `source` looks like a Jinja/Cookiecutter template.
+
+    Some repository files (hooks, templates) include `{{ cookiecutter.* }}`
+    markers which are not valid Python until rendered.
+    """
+    return _TEMPLATE_RE.search(source) is not None
+
+
+def _has_doctests(source: bytes) -> bool:
+    """Return True if `source` contains a `>>>` doctest prompt."""
+    return b">>>" in source
+
+
+def _in_template_root(rel: str) -> bool:
+    """Return True if the relative path `rel` lies where templates are kept.
+
+    That is under one of `_TEMPLATE_DIRS` or below a templated directory
+    name such as `{{cookiecutter.exam_code}}`.
+    """
+    parts = rel.split(os.sep)
+    return parts[0] in _TEMPLATE_DIRS or any("{{" in part for part in parts[:-1])
+
+
+def _iter_candidates(root: Path = ROOT):
+    """Yield paths (as strings) of .py files that may hold doctests.
 
     Excludes:
-      - files in hidden directories (starting with .)
-      - __pycache__ directories
-      - files in the top-level `test` directory (to avoid test modules)
+      - hidden directories (starting with .)
+      - __pycache__, site-packages and node_modules directories
+      - `test` directories (to avoid test modules)
       - files named like test_*.py
+
+    Excluded directories are pruned in place, so `os.walk` never descends
+    into them.
     """
-    for p in root.rglob("*.py"):
-        # Skip files in hidden directories
-        if any(part.startswith(".") for part in p.parts):
-            continue
-        # Skip caches and obvious packaging dirs
-        if "__pycache__" in p.parts or "site-packages" in p.parts:
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in _SKIP_DIRS]
+        for name in files:
+            if name.endswith(".py") and not name.startswith(("test_", ".")):
+                yield os.path.join(dirpath, name)
+
+
+def _iter_python_files(root: Path = ROOT):
+    """Yield candidate Python files to check for doctests.
+
+    Same as `_iter_candidates`, but also excludes Jinja/Cookiecutter
+    template sources and files without any doctest examples. Each file is
+    read once; only files inside template roots are scanned for template
+    markers.
+    """
+    for path in _iter_candidates(root):
+        try:
+            with open(path, "rb") as f:
+                source = f.read()
+        except OSError:
+            # If we can't read the file for any reason, skip it.
             continue
-        # Skip top-level test directory and test files
-        if "test" in p.parts and p.parent.name == "test":
+        if _in_template_root(os.path.relpath(path, root)) and _is_template(source):
             continue
-        if p.name.startswith("test_"):
+        if not _has_doctests(source):
             continue
-        # Skip files that appear to be Jinja/Cookiecutter templates. Some
-        # repository files (hooks, templates) include `{{ cookiecutter.* }}`
-        # markers which are not valid Python until rendered. Avoid importing
-        # those template sources during doctest discovery.
+        yield Path(path)
+
+
+# pytest cache key holding the result of the last discovery run.
+_CACHE_KEY = "doctest/modules"
+
+
+def _collect_module_paths(root: Path = ROOT, cache=None):
+    """Return the sorted list of modules to doctest, reusing a cached result.
+
+    `cache` is a pytest `Cache` (or None to disable caching). The cached
+    entry is keyed on the path and mtime of every candidate file, so a warm
+    run on an unchanged tree only stats files instead of reading them. The
+    mtime of this file is part of the key too, so editing the discovery
+    rules invalidates the entry.
+    """
+    key = [["<discovery>", os.stat(__file__).st_mtime_ns]]
+    for path in _iter_candidates(root):
         try:
-            txt = p.read_text()
-        except Exception:
-            # If we can't read the file for any reason, skip it.
-            continue
-        if ("{{ cookiecutter" in txt) or ("{{" in txt and "}}" in txt) or ("{%" in txt):
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
             continue
-        yield p
+        key.append([os.path.relpath(path, root), mtime])
+    key.sort()
+
+    if cache is not None:
+        cached = cache.get(_CACHE_KEY, None)
+        if isinstance(cached, dict) and cached.get("key") == key:
+            return [root / rel for rel in cached["paths"]]
+
+    paths = sorted(_iter_python_files(root), key=lambda p: p.as_posix())
+    if cache is not None:
+        cache.set(
+            _CACHE_KEY,
+            {"key": key, "paths": [p.relative_to(root).as_posix() for p in paths]},
+        )
+    return paths
+
+
+# Modules already loaded in this process (or xdist worker), keyed by
+# (path, mtime_ns).
+_MOD_CACHE = {}
 
 
 def _load_module_from_path(path: Path, root: Path = ROOT):
     """Import a module from a file path under a unique, deterministic name.
 
-    Returns the imported module object. Raises on import errors.
+    Returns the imported module object, which is also registered in
+    `sys.modules`. Raises on import errors. A module whose file is unchanged
+    since it was last loaded is returned from `_MOD_CACHE` without re-running
+    its top-level code.
     """
+    key = (str(path), path.stat().st_mtime_ns)
+    if key in _MOD_CACHE:
+        return _MOD_CACHE[key]
     # Create a stable module name from the path relative to repo root
     rel = path.relative_to(root).as_posix()
     mod_name = "doctest_mod_" + rel.replace("/", "_").replace(".", "_")
-    spec = importlib.util.spec_from_file_location(mod_name, str(path))
-    module = importlib.util.module_from_spec(spec)
+    code = compile(path.read_bytes(), str(path), "exec")
+    module = types.ModuleType(mod_name)
+    module.__file__ = str(path)
+    # Register before executing so code that looks itself up by name (e.g.
+    # pickling, dataclasses) resolves without a second load, as with import.
+    sys.modules[mod_name] = module
     # Execute module code (this runs top-level statements; import errors will surface)
-    spec.loader.exec_module(module)
+    try:
+        exec(code, module.__dict__)
+    except BaseException:
+        del sys.modules[mod_name]
+        raise
+    _MOD_CACHE[key] = module
     return module
 
 
-# Build the list of module files at import time so pytest can parametrize them.
-MODULE_PATHS = sorted([p for p in _iter_python_files()], key=lambda p: p.as_posix())
+# Discovered module paths, computed once per pytest session.
+_MODULE_PATHS_KEY = pytest.StashKey[list]()
+
+
+def pytest_generate_tests(metafunc):
+    """Parametrize `test_doctests_per_module` over the discovered modules.
+
+    Discovery runs when pytest collects that test rather than as a side
+    effect of importing this module, and can use the session's cache. The
+    result is kept on the config so repeated collections reuse it.
+    """
+    if "path" not in metafunc.fixturenames:
+        return
+    config = metafunc.config
+    paths = config.stash.get(_MODULE_PATHS_KEY, None)
+    if paths is None:
+        cache = getattr(config, "cache", None)
+        paths = config.stash[_MODULE_PATHS_KEY] = _collect_module_paths(cache=cache)
+    metafunc.parametrize(
+        "path", paths, ids=lambda p: p.relative_to(ROOT).as_posix()
+    )
 
 
-@pytest.mark.parametrize("path", MODULE_PATHS)
 def test_doctests_per_module(path: Path):
     """Run doctests found in a single module specified by `path`.
 
@@ -94,63 +210,32 @@ def test_doctests_per_module(path: Path):
 
 
 @pytest.mark.usefixtures()
-def test_doctests_hooks_in_rendered_template(tmp_path: Path):
+def test_doctests_hooks_in_rendered_template(tmp_path: Path, hook_templates: dict):
     """Render the cookiecutter template into a temp dir and run doctests
     found in the generated project's `hooks/` Python modules.
 
     This ensures hook scripts in the rendered project don't contain
     template placeholders at import-time and that their doctests pass.
     """
-    # Ensure cookiecutter importable (we use python -m cookiecutter)
-    try:
-        import cookiecutter  # noqa: F401
-    except Exception:
-        pytest.skip("cookiecutter package is not importable")
+    # Ensure cookiecutter importable (its extensions are used by the template)
+    pytest.importorskip("cookiecutter")
 
     # Render hook templates from the project template's `hooks/` directory
     # using Jinja2 and the same cookiecutter context, then import and
     # run doctests against the rendered hook modules. Hooks are executed
     # during cookiecutter generation but are not copied into the final
     # generated project, so we render them here for testing.
-    valid_context = {
-        "cookiecutter": {
-            "quiz_number": 1,
-            "exam_code": "q01",
-            "exam_name": "Quiz 1",
-            "exam_date": "2025-10-31",
-            "course_name": "",
-            "instructor_name": "",
-            "term_name": "",
-            "site_id": "",
-            "number_copies": 45,
-            "has_versions": False,
-            "use_nyu_fonts": False,
-            "versions_csv": "",
-            "versions_with_solutions": "",
-            "version_randomization_groups": "",
-            "bundle_name": "",
-            "install_dir": "",
-            "_extensions": [
-                "local_extensions.localize_date",
-                "local_extensions.embrace",
-            ],
-        }
-    }
-
-    template_hooks = ROOT / "hooks"
-    if not template_hooks.exists():
+    valid_context = default_replay_context()
+
+    if not (ROOT / "hooks").exists():
         pytest.skip("template has no hooks/ directory; nothing to doctest")
 
     rendered_dir = tmp_path / "rendered_hooks"
     rendered_dir.mkdir()
 
-    env = jinja2.Environment(undefined=jinja2.StrictUndefined)
-
     py_files = []
-    for p in sorted(template_hooks.rglob("*.py")):
-        src = p.read_text()
+    for p, tmpl in hook_templates.items():
         try:
-            tmpl = env.from_string(src)
             rendered = tmpl.render(cookiecutter=valid_context["cookiecutter"])
         except Exception as e:
             pytest.fail(f"Failed to render template hook {p}: {e}")
@@ -162,18 +247,13 @@ def test_doctests_hooks_in_rendered_template(tmp_path: Path):
     if not py_files:
         pytest.skip("no Python hook templates found to render")
 
-    try:
-        for p in py_files:
-            try:
-                module = _load_module_from_path(p, root=rendered_dir)
-            except Exception:
-                pytest.fail(f"Import error in rendered hook module {p}:\n{traceback.format_exc()}")
-
-            failures, attempted = doctest.testmod(
-                module, optionflags=doctest.ELLIPSIS | doctest.NORMALIZE_WHITESPACE
-            )
-            assert failures == 0, f"{failures} doctest failure(s) in rendered hook {p} (out of {attempted} tests)"
-    finally:
-        import shutil as _sh
-        if rendered_dir.exists():
-            _sh.rmtree(rendered_dir)
+    for p in py_files:
+        try:
+            module = _load_module_from_path(p, root=rendered_dir)
+        except Exception:
+            pytest.fail(f"Import error in rendered hook module {p}:\n{traceback.format_exc()}")
+
+        failures, attempted = doctest.testmod(
+            module, optionflags=doctest.ELLIPSIS | doctest.NORMALIZE_WHITESPACE
+        )
+        assert failures == 0, f"{failures} doctest failure(s) in rendered hook {p} (out of {attempted} tests)"
@@ -1,48 +1,79 @@
-import sys
+import functools
+import io
 import subprocess
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import jinja2
-import pytest
 
 
 ROOT = Path(__file__).resolve().parents[1]
 HOOK_PATH = ROOT / "hooks" / "pre_gen_project.py"
 
 
-def render_hook(template_text: str, cookiecutter_context: dict) -> str:
-    env = jinja2.Environment(undefined=jinja2.StrictUndefined)
-    tmpl = env.from_string(template_text)
-    return tmpl.render(cookiecutter=cookiecutter_context)
-
-
 def run_rendered_hook(
     rendered_text: str, tmp_path: Path
 ) -> subprocess.CompletedProcess:
+    """Execute the rendered hook in-process as if it were run as a script.
+
+    Returns a CompletedProcess carrying the exit code and captured output,
+    so callers can assert on it just as on a real subprocess. Output is
+    captured by binding `print` in the hook's globals rather than by
+    redirecting `sys.stdout`, so several hooks can run in parallel threads.
+    The rendered text is also written to `tmp_path` so that tracebacks from
+    the hook show its source lines.
+    """
     target = tmp_path / "pre_gen_project_rendered.py"
     target.write_text(rendered_text, encoding="utf8")
-    # Run as a script so the main block executes
-    return subprocess.run([sys.executable, str(target)], capture_output=True, text=True)
+    code = compile(rendered_text, str(target), "exec")
+    stdout = io.StringIO()
+    stderr = ""
+    returncode = 0
+    namespace = {
+        # Run with __name__ == "__main__" so the main block executes
+        "__name__": "__main__",
+        "__file__": str(target),
+        "print": functools.partial(print, file=stdout),
+    }
+    try:
+        exec(code, namespace)
+    except SystemExit as e:
+        if e.code is None:
+            returncode = 0
+        elif isinstance(e.code, int):
+            returncode = e.code
+        else:
+            stderr = str(e.code)
+            returncode = 1
+    except Exception:
+        stderr = traceback.format_exc()
+        returncode = 1
+    return subprocess.CompletedProcess(
+        args=[str(target)],
+        returncode=returncode,
+        stdout=stdout.getvalue(),
+        stderr=stderr,
+    )
 
 
-@pytest.mark.parametrize(
-    "versions_csv, versions_with_solutions, version_randomization_groups, expect_success",
-    [
-        ("A,B,C", "A,B", "", True),
-        ("A,B", "C", "", False),
-        ("A,B,C", "", "A;B,C", True),
-        ("A,B,C", "", "A;D,C", False),
-    ],
-)
-def test_pre_gen_project_validation(
-    tmp_path: Path,
-    versions_csv,
-    versions_with_solutions,
-    version_randomization_groups,
-    expect_success,
-):
-    template_text = HOOK_PATH.read_text(encoding="utf8")
+# (versions_csv, versions_with_solutions, version_randomization_groups, expect_success)
+CASES = [
+    ("A,B,C", "A,B", "", True),
+    ("A,B", "C", "", False),
+    ("A,B,C", "", "A;B,C", True),
+    ("A,B,C", "", "A;D,C", False),
+]
 
+
+def check_case(template: jinja2.Template, case: tuple, tmp_path: Path) -> str:
+    """Render and run the hook for one case; return an error message or ""."""
+    (
+        versions_csv,
+        versions_with_solutions,
+        version_randomization_groups,
+        expect_success,
+    ) = case
     cookiecutter_ctx = {
         "has_versions": True,
         "versions_csv": versions_csv,
@@ -51,18 +82,30 @@ def test_pre_gen_project_validation(
         "version_randomization_groups": version_randomization_groups
     }
 
-    rendered = render_hook(template_text, cookiecutter_ctx)
+    rendered = template.render(cookiecutter=cookiecutter_ctx)
 
+    tmp_path.mkdir()
     proc = run_rendered_hook(rendered, tmp_path)
 
+    output = f"STDOUT:\n{proc.stdout}\nSTDERR:\n{proc.stderr}"
     if expect_success:
-        assert (
-            proc.returncode == 0
-        ), f"Expected success, got {proc.returncode}\nSTDOUT:\n{proc.stdout}\nSTDERR:\n{proc.stderr}"
+        if proc.returncode != 0:
+            return f"{case}: expected success, got {proc.returncode}\n{output}"
         # should not print the validation error
-        assert "not present in" not in proc.stdout
+        if "not present in" in proc.stdout:
+            return f"{case}: unexpected validation error\n{output}"
     else:
-        assert (
-            proc.returncode != 0
-        ), f"Expected failure, got 0\nSTDOUT:\n{proc.stdout}\nSTDERR:\n{proc.stderr}"
-        assert "not present in" in proc.stdout
+        if proc.returncode == 0:
+            return f"{case}: expected failure, got 0\n{output}"
+        if "not present in" not in proc.stdout:
+            return f"{case}: missing validation error\n{output}"
+    return ""
+
+
+def test_pre_gen_project_validation(tmp_path: Path, hook_templates: dict):
+    """Run every validation case concurrently and report all failures together."""
+    check = functools.partial(check_case, hook_templates[HOOK_PATH])
+    case_dirs = [tmp_path / f"case{i}" for i in range(len(CASES))]
+    with ThreadPoolExecutor(max_workers=len(CASES)) as pool:
+        errors = [e for e in pool.map(check, CASES, case_dirs) if e]
+    assert not errors, "\n\n".join(errors)
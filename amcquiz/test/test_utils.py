@@ -1,43 +1,74 @@
 from pathlib import Path
+import contextlib
+import functools
+import io
 import json
+import mmap
+import os
 import subprocess
 import sys
-import os
 import shutil
+import traceback
+import types
+
+import jinja2
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 
+# Shared Jinja2 environment for rendering template sources (e.g. hooks) in tests.
+JINJA_ENV = jinja2.Environment(undefined=jinja2.StrictUndefined)
+
+
+def compile_template(src: str) -> jinja2.Template:
+    """Compile template source with `JINJA_ENV`."""
+    return JINJA_ENV.from_string(src)
+
+
+@functools.lru_cache(maxsize=None)
+def check_command(name: str) -> bool:
+    """Return True if `name` is an executable on PATH (memoized per name)."""
+    return shutil.which(name) is not None
+
+
+# Baseline replay values mirroring the keys in `cookiecutter.json`.
+_BASE_CTX = types.MappingProxyType(
+    {
+        "quiz_number": 1,
+        "exam_code": "q01",
+        "exam_name": "Quiz 1",
+        "exam_date": "2025-10-31",
+        "course_name": "",
+        "instructor_name": "",
+        "term_name": "",
+        "site_id": "",
+        "number_copies": 45,
+        "use_nyu_fonts": False,
+        "has_versions": False,
+        "versions_csv": "",
+        "versions_with_solutions": "",
+        "version_randomization_groups": "",
+        "bundle_name": "",
+        "install_dir": "",
+        "_extensions": (
+            "local_extensions.localize_date",
+            "local_extensions.embrace",
+        ),
+    }
+)
+
 
 def default_replay_context(**overrides):
     """Return a minimal valid cookiecutter replay context.
 
     Accepts overrides for convenience (e.g., has_versions=True).
     """
-    ctx = {
-        "cookiecutter": {
-            "quiz_number": 1,
-            "exam_code": "q01",
-            "exam_name": "Quiz 1",
-            "exam_date": "2025-10-31",
-            "course_name": "",
-            "instructor_name": "",
-            "term_name": "",
-            "site_id": "",
-            "number_copies": 45,
-            "use_nyu_fonts": False,
-            "has_versions": False,
-            "versions_csv": "",
-            "versions_with_solutions": "",
-            "version_randomization_groups": "",
-            "bundle_name": "",
-            "install_dir": "",
-            "_extensions": [
-                "local_extensions.localize_date",
-                "local_extensions.embrace",
-            ],
-        }
-    }
+    ctx = {"cookiecutter": dict(_BASE_CTX)}
     # Apply overrides deeply for cookiecutter keys
     if overrides:
         for k, v in overrides.items():
@@ -49,28 +80,94 @@ def default_replay_context(**overrides):
     return ctx
 
 
+def dump_replay(context: dict) -> bytes:
+    """Serialize a replay context as compact JSON bytes.
+
+    Uses `orjson` when it is installed, else the standard library (which
+    produces ASCII-only output).
+    """
+    if orjson is not None:
+        return orjson.dumps(context)
+    return json.dumps(context, separators=(",", ":")).encode("ascii")
+
+
 def write_replay(tmp_path: Path, context: dict, name: str = "replay.json") -> Path:
     replay = tmp_path / name
-    replay.write_text(json.dumps(context))
+    replay.write_bytes(dump_replay(context))
     return replay
 
 
-def prepare_env(tmp_path: Path) -> dict:
-    env = dict(**{k: v for k, v in os.environ.items()})
-    env["HOME"] = str(tmp_path)
-    env["XDG_CONFIG_HOME"] = str(tmp_path / ".config")
-    return env
+def prepare_config(tmp_path: Path) -> Path:
+    """Write a cookiecutter user config that keeps its state under `tmp_path`.
+
+    Overriding HOME would not isolate an in-process run: cookiecutter
+    resolves `~` once at import time.
+    """
+    config = tmp_path / "cookiecutterrc.yaml"
+    config.write_text(
+        f"cookiecutters_dir: {json.dumps(str(tmp_path / 'cookiecutters'))}\n"
+        f"replay_dir: {json.dumps(str(tmp_path / 'cookiecutter_replay'))}\n"
+    )
+    return config
 
 
 def run_cookiecutter_with_replay(
-    replay_path: Path, output_dir: Path, env=None
+    replay_path: Path, output_dir: Path, config_file: Path = None
 ) -> subprocess.CompletedProcess:
-    """Run cookiecutter with a replay file and return the CompletedProcess.
+    """Run cookiecutter in-process with a replay file and return a CompletedProcess.
+
+    Any exception raised by cookiecutter is reported as return code 1 with
+    the traceback in stderr, mirroring the CLI. If `config_file` is None an
+    isolated config is written next to the replay file.
 
     The caller can assert on returncode and inspect stdout/stderr.
     """
+    from cookiecutter.main import cookiecutter
+
+    if config_file is None:
+        config_file = prepare_config(replay_path.parent)
+    args = [
+        str(REPO_ROOT),
+        "--replay-file",
+        str(replay_path),
+        "--output-dir",
+        str(output_dir),
+    ]
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            cookiecutter(
+                str(REPO_ROOT),
+                replay=str(replay_path),
+                output_dir=str(output_dir),
+                config_file=str(config_file),
+                accept_hooks=False,
+            )
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+    return subprocess.CompletedProcess(
+        args=args,
+        returncode=returncode,
+        stdout=stdout.getvalue(),
+        stderr=stderr.getvalue(),
+    )
+
+
+def run_cookiecutter_cli(
+    replay_path: Path, output_dir: Path
+) -> subprocess.CompletedProcess:
+    """Run cookiecutter as a subprocess with a replay file and return the CompletedProcess.
+
+    Used where the child needs the caller's environment, e.g. before a real
+    `l3build` run. The caller can assert on returncode and inspect stdout/stderr.
+    """
     cmd = [
         sys.executable,
+        # Don't spend time writing .pyc files for a throwaway interpreter
+        "-B",
         "-m",
         "cookiecutter",
         str(REPO_ROOT),
@@ -81,71 +178,43 @@ def run_cookiecutter_with_replay(
         "--accept-hooks",
         "no",
     ]
-    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
-    return proc
+    # Keep stdout: the CLI reports handled errors there via click.echo. The
+    # child inherits no descriptors worth closing, so skip the fd sweep.
+    return subprocess.run(cmd, capture_output=True, text=True, close_fds=False)
 
 
-def run_l3build_doc(
-    replay_path: Path,
-    output_dir: Path,
-    *,
-    exam_code: str = "q01",
-    env=None,
-    auto_repair: bool = False,
-) -> subprocess.CompletedProcess:
-    """Render a project with cookiecutter replay and run `l3build doc`.
+# Create a repository with a single commit, in one shell instead of three
+# separate git processes.
+_GIT_INIT_SCRIPT = (
+    "git init -q"
+    " && git add -A"
+    " && git -c user.name=tester -c user.email=tester@example.com"
+    " commit -q -m initial --author 'tester <tester@example.com>'"
+)
+
+
+def init_git_repo(path: Path, **kwargs) -> subprocess.CompletedProcess:
+    """Initialize a git repository in `path` and commit everything in it.
 
-    - replay_path: path to the replay JSON
-    - output_dir: directory where cookiecutter will write the generated project
-    - exam_code: the generated project directory name (defaults to q01)
-    - env: subprocess env for cookiecutter (if None, the caller's env is used)
+    Extra keyword arguments are passed to `subprocess.run`. Raises
+    CalledProcessError if any of the git commands fails.
+    """
+    return subprocess.run(
+        ["sh", "-c", _GIT_INIT_SCRIPT], cwd=str(path), check=True, **kwargs
+    )
+
+
+def l3build_doc(gen_dir: Path, *, auto_repair: bool = False) -> subprocess.CompletedProcess:
+    """Run `l3build doc` in an already rendered (and git-initialised) project.
+
+    - gen_dir: the generated project directory
     - auto_repair: if True, attempt font-db / luaotfload repairs once on failure
 
     Returns the CompletedProcess from the final `l3build doc` invocation.
     """
-    # Render the template
-    proc = run_cookiecutter_with_replay(replay_path, output_dir, env=env)
-    if proc.returncode != 0:
-        return proc
-
-    gen_dir = output_dir / exam_code
-    if not gen_dir.exists():
-        # Return an artificial CompletedProcess-like object for caller convenience
-        fake = subprocess.CompletedProcess(
-            args=["cookiecutter"],
-            returncode=1,
-            stdout="",
-            stderr=f"generated dir not found: {gen_dir}",
-        )
-        return fake
-
-    # Init git so vc.lua can read metadata
-    try:
-        subprocess.run(
-            ["git", "init"], cwd=str(gen_dir), check=True, capture_output=True
-        )
-        subprocess.run(
-            ["git", "add", "-A"], cwd=str(gen_dir), check=True, capture_output=True
-        )
-        subprocess.run(
-            [
-                "git",
-                "commit",
-                "-m",
-                "initial",
-                "--author",
-                "tester <tester@example.com>",
-            ],
-            cwd=str(gen_dir),
-            check=True,
-            capture_output=True,
-        )
-    except subprocess.CalledProcessError as e:
-        # If git fails, continue — l3build/ vc.lua may still work in some cases
-        pass
-
-    # Run l3build doc
     cmd = ["l3build", "doc", "--halt-on-error", "--show-log-on-error"]
+    # Keep stdout: it holds the LaTeX log that explains a failed build, and a
+    # second build would start from the first one's aux files.
     proc = subprocess.run(cmd, cwd=str(gen_dir), capture_output=True, text=True)
 
     # Optionally attempt a simple auto-repair for common font/db issues
@@ -169,17 +238,29 @@ def run_l3build_doc(
 
         if repair_attempted:
             # retry once
-            proc = subprocess.run(cmd, cwd=str(gen_dir), capture_output=True, text=True)
+            proc = subprocess.run(
+                cmd, cwd=str(gen_dir), capture_output=True, text=True
+            )
 
     return proc
 
 
-def read_generated_dtx(gen_dir: Path, exam_code: str = "q01") -> str:
-    """Read and return the generated `.dtx` file contents for the given exam code.
+@contextlib.contextmanager
+def open_generated_dtx(gen_dir: Path, exam_code: str = "q01"):
+    """Memory-map the generated `.dtx` file for the given exam code, read-only.
+
+    Yields an `mmap.mmap`, so callers can search it with `.find(b"...")`
+    without reading the file into a string. An empty file cannot be mapped,
+    so `b""` is yielded instead.
 
     Raises FileNotFoundError if the expected .dtx file is not present.
     """
     dtx_path = gen_dir / f"{exam_code}.dtx"
     if not dtx_path.exists():
         raise FileNotFoundError(f"generated .dtx not found: {dtx_path}")
-    return dtx_path.read_text(encoding="utf-8")
+    with open(dtx_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm